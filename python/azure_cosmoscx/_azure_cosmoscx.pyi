@@ -1,4 +1,4 @@
-from typing import Union
+from typing import Callable, Optional, Sequence, Tuple, Union
 
 import azure.cosmos.query_engine
 
@@ -16,7 +16,14 @@ class QueryEngine(azure.cosmos.query_engine.QueryEngine):
 
 
 class QueryPipeline(azure.cosmos.query_engine.QueryPipeline):
-    pass
+    def provide_data_batch(
+            self, batch: Sequence[Tuple[str, int, bytes, Optional[str]]]) -> None:
+        pass
+
+    def run_to_completion(
+            self,
+            data_provider: Callable[[str, Optional[str], Optional[str], bool], Tuple[bytes, Optional[str]]]) -> list[bytes]:
+        pass
 
 
 class DataRequest(azure.cosmos.query_engine.DataRequest):
@@ -24,4 +31,4 @@ class DataRequest(azure.cosmos.query_engine.DataRequest):
 
 
 class PipelineResult(azure.cosmos.query_engine.PipelineResult):
-    pass
+    item_count: int
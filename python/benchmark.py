@@ -1,85 +1,74 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
-import sys
+import argparse
+from collections import deque
+from itertools import chain
 import azure.cosmos
 import azure_cosmoscx
 import warnings
 import urllib3
-import timeit
+import time
 
 warnings.filterwarnings(
     "ignore", category=urllib3.exceptions.InsecureRequestWarning)
 
-endpoint = "https://localhost:8081"
-key = "C2y6yDjf5/R+ob0N8A7Cgv30VRDJIWEHLM+4QDU5DE2nQ9nDuVTqobD4b8mGGyPMbIZnqyMsEcaGQy67XIw/Jw=="
-databaseName = "SampleDB"
-containerName = "SampleContainer"
-query = None
-run_python = True
-run_cosmoscx = True
 
-# Parse arguments
-i = 1
-while i < len(sys.argv):
-    if sys.argv[i] == "--endpoint":
-        endpoint = sys.argv[i+1]
-        i += 1
-    elif sys.argv[i] == "--key":
-        key = sys.argv[i+1]
-        i += 1
-    elif sys.argv[i] == "--database":
-        databaseName = sys.argv[i+1]
-        i += 1
-    elif sys.argv[i] == "--container":
-        containerName = sys.argv[i+1]
-        i += 1
-    elif sys.argv[i] == "--skip-python":
-        run_python = False
-    elif sys.argv[i] == "--skip-cosmoscx":
-        run_cosmoscx = False
-    else:
-        query = sys.argv[i]
-    i += 1
-
-if query is None:
-    print(
-        "Usage: benchmark.py [--endpoint ENDPOINT] [--key KEY] [--database DATABASE] [--container CONTAINER] QUERY")
-    sys.exit(1)
-
-
-def run_benchmark(query_engine):
+def run_benchmark(args, query_engine):
     client = azure.cosmos.CosmosClient(
-        endpoint, key, connection_verify=False, query_engine=query_engine)
-    db = client.get_database_client(databaseName)
-    container = db.get_container_client(containerName)
+        args.endpoint, args.key, connection_verify=False, query_engine=query_engine)
+    db = client.get_database_client(args.database)
+    container = db.get_container_client(args.container)
+
+    query = args.query
+    query_items = container.query_items
 
     def run_query():
-        items = container.query_items(query, enable_cross_partition_query=True)
-        pager = items.by_page(None)
-        for page in pager:
-            for item in page:
-                pass
+        items = query_items(query, enable_cross_partition_query=True)
+        # Exhaust every page without keeping the items around.
+        deque(chain.from_iterable(items.by_page(None)), maxlen=0)
 
     # Run once, unmeasured, to warm up
     run_query()
 
+    # Time a plain loop rather than using timeit, so GC stays enabled like it would in a real application.
     count = 10
-    time = timeit.timeit(stmt=run_query, number=count)
+    start = time.perf_counter()
+    for _ in range(count):
+        run_query()
+    elapsed = time.perf_counter() - start
     print(
-        f"Ran {count} times in {time * 1000}ms, {(time / count) * 1000}ms per run")
+        f"Ran {count} times in {elapsed * 1000}ms, {(elapsed / count) * 1000}ms per run")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--endpoint", default="https://localhost:8081")
+    parser.add_argument(
+        "--key", default="C2y6yDjf5/R+ob0N8A7Cgv30VRDJIWEHLM+4QDU5DE2nQ9nDuVTqobD4b8mGGyPMbIZnqyMsEcaGQy67XIw/Jw==")
+    parser.add_argument("--database", default="SampleDB")
+    parser.add_argument("--container", default="SampleContainer")
+    parser.add_argument("--skip-python", dest="run_python",
+                        action="store_false")
+    parser.add_argument("--skip-cosmoscx", dest="run_cosmoscx",
+                        action="store_false")
+    parser.add_argument("query")
+    args = parser.parse_args()
+
+    if args.run_python:
+        print("Using python query engine")
+        run_benchmark(args, None)
 
+    if args.run_cosmoscx:
+        print("Using cosmoscx query engine")
+        azure_cosmoscx.enable_tracing()
+        query_engine = azure_cosmoscx.QueryEngine()
+        run_benchmark(args, query_engine)
 
-if run_python:
-    print("Using python query engine")
-    run_benchmark(None)
+    print()
+    print()
+    print()
 
-if run_cosmoscx:
-    print("Using cosmoscx query engine")
-    azure_cosmoscx.enable_tracing()
-    query_engine = azure_cosmoscx.QueryEngine()
-    run_benchmark(query_engine)
 
-print()
-print()
-print()
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
-import sys
+import argparse
 import azure.cosmos
 import azure_cosmoscx
 import warnings
@@ -10,63 +10,41 @@ import urllib3
 warnings.filterwarnings(
     "ignore", category=urllib3.exceptions.InsecureRequestWarning)
 
-endpoint = "https://localhost:8081"
-key = "C2y6yDjf5/R+ob0N8A7Cgv30VRDJIWEHLM+4QDU5DE2nQ9nDuVTqobD4b8mGGyPMbIZnqyMsEcaGQy67XIw/Jw=="
-databaseName = "SampleDB"
-containerName = "SampleContainer"
-use_cosmoscx = False
-query = None
 
-# Parse arguments
-i = 1
-while i < len(sys.argv):
-    if sys.argv[i] == "--endpoint":
-        endpoint = sys.argv[i+1]
-        i += 1
-    elif sys.argv[i] == "--key":
-        key = sys.argv[i+1]
-        i += 1
-    elif sys.argv[i] == "--database":
-        databaseName = sys.argv[i+1]
-        i += 1
-    elif sys.argv[i] == "--container":
-        containerName = sys.argv[i+1]
-        i += 1
-    elif sys.argv[i] == "--use-cosmoscx":
-        use_cosmoscx = True
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--endpoint", default="https://localhost:8081")
+    parser.add_argument(
+        "--key", default="C2y6yDjf5/R+ob0N8A7Cgv30VRDJIWEHLM+4QDU5DE2nQ9nDuVTqobD4b8mGGyPMbIZnqyMsEcaGQy67XIw/Jw==")
+    parser.add_argument("--database", default="SampleDB")
+    parser.add_argument("--container", default="SampleContainer")
+    parser.add_argument("--use-cosmoscx", action="store_true")
+    parser.add_argument("query")
+    args = parser.parse_args()
+
+    query_engine = None
+    if args.use_cosmoscx:
+        print("Using cosmoscx query engine")
+        azure_cosmoscx.enable_tracing()
+        query_engine = azure_cosmoscx.QueryEngine()
     else:
-        query = sys.argv[i]
-    i += 1
+        print("Using python query engine")
 
-if query is None:
-    print(
-        "Usage: sample.py [--endpoint ENDPOINT] [--key KEY] [--database DATABASE] [--container CONTAINER] [--use-cosmoscx] QUERY")
-    sys.exit(1)
+    client = azure.cosmos.CosmosClient(
+        args.endpoint, args.key, connection_verify=False, query_engine=query_engine)
+    db = client.get_database_client(args.database)
+    container = db.get_container_client(args.container)
 
-query_engine = None
-if use_cosmoscx:
-    print("Using cosmoscx query engine")
-    azure_cosmoscx.enable_tracing()
-    query_engine = azure_cosmoscx.QueryEngine()
-else:
-    print("Using python query engine")
-
-client = azure.cosmos.CosmosClient(
-    endpoint, key, connection_verify=False, query_engine=query_engine)
-db = client.get_database_client(databaseName)
-container = db.get_container_client(containerName)
-
-
-def run_query():
-    items = container.query_items(query, enable_cross_partition_query=True)
+    items = container.query_items(args.query, enable_cross_partition_query=True)
     pager = items.by_page(None)
     for page in pager:
         for item in page:
             print(item)
 
+    print()
+    print()
+    print()
 
-run_query()
 
-print()
-print()
-print()
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,10 @@ use std::{ops::DerefMut, sync::Mutex};
 use azure_data_cosmos_engine::query::{PartitionKeyRange, PipelineResponse, QueryPipeline};
 use pyo3::{
     exceptions, pyclass, pymethods,
-    types::{PyAnyMethods, PyBytes, PyBytesMethods, PyInt, PyList, PyString, PyStringMethods},
+    types::{
+        PyAnyMethods, PyBytes, PyBytesMethods, PyInt, PyList, PyListMethods, PyString,
+        PyStringMethods,
+    },
     Bound, Py, PyAny, PyErr, PyResult, Python,
 };
 
@@ -24,6 +27,18 @@ impl NativeQueryPipeline {
             .lock()
             .map_err(|_| PyErr::new::<exceptions::PyRuntimeError, _>("lock poisoned"))
     }
+
+    fn provide_data_locked(
+        pipeline: &mut QueryPipeline,
+        pkrange_id: &str,
+        request_id: u64,
+        data: &Bound<PyBytes>,
+        continuation: Option<String>,
+    ) -> PyResult<()> {
+        // Pass the raw bytes directly to the pipeline
+        pipeline.provide_data(pkrange_id, request_id, data.as_bytes(), continuation)?;
+        Ok(())
+    }
 }
 
 // All methods in this block are python-accessible
@@ -59,22 +74,96 @@ impl NativeQueryPipeline {
         data: Bound<'py, PyBytes>,
         continuation: Option<Bound<'py, PyString>>,
     ) -> PyResult<()> {
-        let mut pipeline = self.pipeline()?;
         let pkrange_id = pkrange_id.to_str()?;
         let request_id = request_id.extract()?;
         let continuation = continuation
             .map(|s| s.to_str().map(|s| s.to_string()))
             .transpose()?;
-        // Pass the raw bytes directly to the pipeline
-        pipeline.provide_data(pkrange_id, request_id, data.as_bytes(), continuation)?;
+
+        let mut pipeline = self.pipeline()?;
+        Self::provide_data_locked(&mut pipeline, pkrange_id, request_id, &data, continuation)
+    }
+
+    /// Provides data for several requests at once.
+    ///
+    /// `batch` is any sequence of `(pkrange_id, request_id, data, continuation)` tuples, with the same meaning as the arguments to `provide_data`.
+    /// The whole batch is applied under a single lock acquisition, and in a single call from Python.
+    ///
+    /// Every entry is converted before any are applied, so a malformed entry (or a string that isn't valid UTF-8) leaves the pipeline untouched.
+    /// However, if the pipeline itself rejects an entry (for example, an unknown partition key range), the entries before it have already been applied.
+    fn provide_data_batch<'py>(&self, batch: Bound<'py, PyAny>) -> PyResult<()> {
+        let batch: Vec<(String, u64, Bound<'py, PyBytes>, Option<String>)> = batch.extract()?;
+
+        let mut pipeline = self.pipeline()?;
+        for (pkrange_id, request_id, data, continuation) in batch {
+            Self::provide_data_locked(&mut pipeline, &pkrange_id, request_id, &data, continuation)?;
+        }
         Ok(())
     }
+
+    /// Runs the pipeline until it terminates, returning all the items it produces.
+    ///
+    /// Whenever the pipeline needs more data, `data_provider` is called as `data_provider(pkrange_id, continuation, query, include_parameters)`.
+    /// `query` is `None` when the pipeline's own query (see `query()`) should be used. Otherwise, it is the query text to send for this request,
+    /// and `include_parameters` indicates if the user's query parameters should be sent with it.
+    /// `data_provider` must return a `(data, continuation)` tuple, where `data` is the raw response body for that partition,
+    /// and `continuation` is the continuation for the next page, or `None` if the partition has no more data.
+    ///
+    /// The pipeline lock is released while `data_provider` runs, so it is free to call back into this pipeline.
+    ///
+    /// Raises `RuntimeError` if the pipeline stalls, producing no items and issuing no data requests without terminating.
+    fn run_to_completion<'py>(
+        &self,
+        py: Python<'py>,
+        data_provider: Bound<'py, PyAny>,
+    ) -> PyResult<Bound<'py, PyList>> {
+        let items = PyList::empty(py);
+        loop {
+            let result = self.pipeline()?.run()?;
+            let produced_items = !result.items.is_empty();
+            for item in result.items {
+                items.append(PyBytes::new(py, item.get().as_bytes()))?;
+            }
+
+            if result.terminated {
+                return Ok(items);
+            }
+
+            // A pipeline that isn't terminated, but produced nothing and needs no data, would never make progress.
+            if !produced_items && result.requests.is_empty() {
+                return Err(PyErr::new::<exceptions::PyRuntimeError, _>(
+                    "pipeline stalled: not terminated but issued no data requests",
+                ));
+            }
+
+            for request in result.requests {
+                let (data, continuation): (Bound<'py, PyBytes>, Option<String>) = data_provider
+                    .call1((
+                        request.pkrange_id.as_ref(),
+                        request.continuation,
+                        request.query,
+                        request.include_parameters,
+                    ))?
+                    .extract()?;
+                Self::provide_data_locked(
+                    &mut self.pipeline()?,
+                    &request.pkrange_id,
+                    request.id,
+                    &data,
+                    continuation,
+                )?;
+            }
+        }
+    }
 }
 
 #[pyclass(name = "PipelineResult")]
 pub struct PyPipelineResult {
     #[pyo3(get)]
     items: Py<PyList>,
+    /// The number of items in `items`, for callers that only need a count.
+    #[pyo3(get)]
+    item_count: usize,
     #[pyo3(get)]
     requests: Py<PyList>,
     #[pyo3(get)]
@@ -83,6 +172,7 @@ pub struct PyPipelineResult {
 
 impl PyPipelineResult {
     pub fn new(py: Python, result: PipelineResponse) -> PyResult<Self> {
+        let item_count = result.items.len();
         let items = result
             .items
             .into_iter()
@@ -95,6 +185,7 @@ impl PyPipelineResult {
         let requests = PyList::new(py, requests)?.unbind();
         Ok(Self {
             items,
+            item_count,
             requests,
             terminated: result.terminated,
         })
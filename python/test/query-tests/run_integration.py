@@ -1,17 +1,27 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
-import json
+import os
 import pathlib
-import uuid
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
-from azure.cosmos import CosmosClient, PartitionKey
+from azure.cosmos import ContainerProxy, CosmosClient, PartitionKey
 
-from typing import TypedDict, Any, List, Tuple, Set
+from typing import TypedDict, Any, Callable, Dict, List, Tuple
 
 from test.test_config import TestConfig
 
-CONTAINER_PROPERTIES = "containerProperties"
+# orjson parses much faster than the standard library, but it's optional
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+CONTAINERS = "containers"
+CONTAINER = "container"
 DATA = "data"
 NAME = "name"
 TEST_DATA = "testData"
@@ -20,16 +30,34 @@ QUERY = "query"
 ID = "id"
 PARTITION_KEY = "partitionKey"
 PATHS = "paths"
+INDEXING_POLICY = "indexingPolicy"
+VECTOR_EMBEDDING_POLICY = "vectorEmbeddingPolicy"
+FULL_TEXT_POLICY = "fullTextPolicy"
 RESULTS_SUFFIX = ".results.json"
 
+# metadata keys that are not relevant for testing
+_IGNORED = frozenset({"_rid", "_self", "_etag", "_attachments", "_ts"})
+
+_SENTINEL = object()
+
+# Number of documents inserted concurrently while setting up a test container.
+INSERT_WORKERS = int(os.getenv("COSMOSCX_INSERT_WORKERS", "32"))
+
+# Number of queries from a query set run concurrently. Set to 1 to run them serially, in order, for debugging.
+QUERY_WORKERS = int(os.getenv("COSMOSCX_QUERY_WORKERS", "8"))
+
+# per-process counter used to make test database names unique
+_COUNTER = itertools.count()
+
 class TestData(TypedDict):
-    containerProperties: dict[str, Any]
+    containers: List[dict[str, Any]]
     data: List[dict[str, Any]]
 
 
 class QuerySpec(TypedDict):
     name: str
     query: str
+    container: str
 
 
 class QuerySet(TypedDict):
@@ -37,80 +65,133 @@ class QuerySet(TypedDict):
     testData: str
     queries: List[QuerySpec]
 
+def _insert_items(container, items: List[dict[str, Any]]) -> None:
+    with ThreadPoolExecutor(max_workers=INSERT_WORKERS) as executor:
+        # consume the results so any insert failure is raised here
+        list(executor.map(lambda item: container.create_item(body=item), items))
+
+# reuses one client (and its connection pool) for every test in the process
+@lru_cache(maxsize=1)
+def _get_client(host: str, key: str) -> CosmosClient:
+    return CosmosClient(url=host, credential=key)
+
 def _run_with_resources(
         test_data: TestData,
-        fn,
+        unique_name: str,
+        fn: Callable[[Dict[str, ContainerProxy]], None],
 ) -> None:
-    client = CosmosClient(url=TestConfig.host, credential=TestConfig.masterKey)
-    unique_name = test_data[CONTAINER_PROPERTIES][ID]
-    db = client.create_database_if_not_exists(id=unique_name)
+    client = _get_client(TestConfig.host, TestConfig.masterKey)
+    # the name is unique to this run, so skip the existence check create_database_if_not_exists would make
+    db = client.create_database(id=unique_name)
     try:
-        pk_paths: list[str] = test_data[CONTAINER_PROPERTIES][PARTITION_KEY][PATHS]
-        pk = PartitionKey(path=pk_paths[0])  # single-path only
-        container = db.create_container_if_not_exists(
-            id=unique_name,
-            partition_key=pk,
-            offer_throughput=40000
-        )
+        # create every container once, up front
+        containers: Dict[str, ContainerProxy] = {}
+        for container_def in test_data[CONTAINERS]:
+            pk_paths: list[str] = container_def[PARTITION_KEY][PATHS]
+            pk = PartitionKey(path=pk_paths[0])  # single-path only
+            containers[container_def[ID]] = db.create_container(
+                id=container_def[ID],
+                partition_key=pk,
+                indexing_policy=container_def.get(INDEXING_POLICY),
+                vector_embedding_policy=container_def.get(VECTOR_EMBEDDING_POLICY),
+                full_text_policy=container_def.get(FULL_TEXT_POLICY),
+                offer_throughput=40000
+            )
 
         # insert documents
-        for item in test_data[DATA]:
-            container.create_item(body=item)
+        for container in containers.values():
+            _insert_items(container, test_data[DATA])
 
-        # hand control to the caller
-        fn(container)
+        # hand control to the caller, once, with every container keyed by id
+        fn(containers)
     finally:
         client.delete_database(unique_name)
 
 # gets the information for the query being tested and sample data to insert to container from a file
-def _load_query_context(query_path: pathlib.Path) -> Tuple[QuerySet, TestData, pathlib.Path]:
+def _load_query_context(query_path: pathlib.Path) -> Tuple[QuerySet, TestData, pathlib.Path, str]:
     with query_path.open("rb") as fh:
-        query_spec: QuerySet = json.load(fh)
+        query_spec: QuerySet = _json_loads(fh.read())
 
-    uid = f"it_{query_spec[NAME]}_{uuid.uuid4()}"
-    test_path = str(query_path) + "/../" + query_spec[TEST_DATA]
-
-    test_file = pathlib.Path(test_path).resolve()
+    # timestamp + pid + counter is unique across processes, without pulling entropy from the OS like uuid4 does
+    uid = f"it_{query_spec[NAME]}_{int(time.time() * 1000):x}_{os.getpid()}_{next(_COUNTER)}"
+    # the test data and results paths are relative to the directory containing the query set file
+    base_dir = query_path.parent
+    test_file = base_dir / query_spec[TEST_DATA]
 
     with test_file.open("rb") as fh:
-        test_data: TestData = json.load(fh)
-
-    test_data[CONTAINER_PROPERTIES][ID] = uid
-
-    return query_spec, test_data, query_path
-
-def validate_results(expected: dict[str, Any], actual: dict[str, Any], ignored_keys: Set[str]) -> None:
-
-    # removes some metadata keys that are not relevant for testing
-    for key in ignored_keys:
-        actual.pop(key, None)
-        expected.pop(key, None)
-
-    assert expected == actual
-
-def _run_single_query(expected: list[dict[str, Any]], query: QuerySpec, container) -> None:
-    iterator = container.query_items(
+        test_data: TestData = _json_loads(fh.read())
+
+    return query_spec, test_data, base_dir, uid
+
+# loads expected results, parsing each file at most once per process
+# validation never mutates the expected items, so the cached list can be shared
+@lru_cache(maxsize=128)
+def _load_results(res_file: pathlib.Path) -> List[Any]:
+    with res_file.open("rb") as fh:
+        return _json_loads(fh.read())
+
+# reads every expected-results file for a query set concurrently, keyed by query name
+def _prefetch_results(query_set: QuerySet, base_dir: pathlib.Path) -> Dict[str, List[Any]]:
+    res_files = [base_dir / f"{query_set[NAME]}/{query[NAME]}{RESULTS_SUFFIX}" for query in query_set[QUERIES]]
+    with ThreadPoolExecutor() as executor:
+        results = executor.map(_load_results, res_files)
+        return {query[NAME]: expected for query, expected in zip(query_set[QUERIES], results)}
+
+def _strip_metadata(item: Any) -> Any:
+    # scalar results (e.g. from aggregates) have no metadata to remove
+    if not isinstance(item, dict):
+        return item
+    return {k: v for k, v in item.items() if k not in _IGNORED}
+
+def _assert_item_matches(name: str, index: int, expected_item: Any, actual_item: Any) -> None:
+    expected_item = _strip_metadata(expected_item)
+    actual_item = _strip_metadata(actual_item)
+
+    # comparing key counts first is cheap, and names the offending keys when they differ
+    if isinstance(expected_item, dict) and isinstance(actual_item, dict):
+        assert len(expected_item) == len(actual_item), \
+            f"{name}: item {index} key count mismatch: missing {set(expected_item) - set(actual_item)}, unexpected {set(actual_item) - set(expected_item)}"
+
+    assert actual_item == expected_item, f"{name}: item {index} does not match: expected {expected_item!r}, got {actual_item!r}"
+
+def _run_single_query(expected: list[Any], query: QuerySpec, container) -> None:
+    iterator = iter(container.query_items(
         query=query[QUERY],
         enable_cross_partition_query=True
-    )
-    results = list(iterator)
-    ignored_keys = {"_rid", "_self", "_etag", "_attachments", "_ts"}
-    for i, item in enumerate(results):
-        validate_results(expected[i], item, ignored_keys)
-    assert len(results) == len(expected)
+    ))
+
+    # validate items as pages arrive, rather than holding the whole result set
+    count = 0
+    for expected_item, actual_item in zip(expected, iterator):
+        _assert_item_matches(query[NAME], count, expected_item, actual_item)
+        count += 1
+    assert count == len(expected), f"{query[NAME]}: expected {len(expected)} items, got {count}"
+
+    # zip stops at the end of the expected items, so check the query didn't return more
+    assert next(iterator, _SENTINEL) is _SENTINEL, f"{query[NAME]}: query returned more than {len(expected)} items"
 
 def run_integration_test(query_set_path: str) -> None:
     full_path = pathlib.Path(query_set_path).resolve()
 
-    query_set, test_data, query_path = _load_query_context(full_path)
+    query_set, test_data, base_dir, unique_name = _load_query_context(full_path)
+
+    # load all the expected results before any containers are created
+    expected_results = _prefetch_results(query_set, base_dir)
+
+    # runs the queries to be tested against their expected results
+    def _runner(containers: Dict[str, ContainerProxy]):
+        def _run_one(query: QuerySpec) -> None:
+            _run_single_query(expected_results[query[NAME]], query, containers[query[CONTAINER]])
 
-    # gets expected results from file and runs the queries to be tested
-    def _runner(container):
-        for query in query_set[QUERIES]:
-            res_file = query_path.parent / f"{query_set[NAME]}/{query[NAME]}{RESULTS_SUFFIX}"
-            with res_file.open("rb") as fh:
-                expected = json.load(fh)
-            _run_single_query(expected, query, container)
-            print(f"✓ {query[NAME]}")
+        done: List[str] = []
+        try:
+            with ThreadPoolExecutor(max_workers=QUERY_WORKERS) as executor:
+                # map yields in submission order and re-raises the first failure here, on the calling thread
+                for query, _ in zip(query_set[QUERIES], executor.map(_run_one, query_set[QUERIES])):
+                    done.append(query[NAME])
+        finally:
+            # report progress in one write, rather than one per query
+            if done:
+                print("\n".join(f"✓ {name}" for name in done))
 
-    _run_with_resources(test_data, _runner)
+    _run_with_resources(test_data, unique_name, _runner)
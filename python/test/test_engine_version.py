@@ -1,10 +1,13 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+import re
 import unittest
 import azure_cosmoscx
 
+_VER_RE = re.compile(r"\d+\.\d+\.\d+")
+
 
 class TestEngineVersion(unittest.TestCase):
     def test_engine_version(self):
-        self.assertRegex(azure_cosmoscx.version(), r"\d+\.\d+\.\d+")
+        self.assertRegex(azure_cosmoscx.version(), _VER_RE)
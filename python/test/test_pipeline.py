@@ -1,11 +1,16 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+import json
 import unittest
 import azure_cosmoscx
 
 
 class TestPipeline(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = azure_cosmoscx.QueryEngine()
+
     def test_native_interop(self):
         plan = {
             "partitionedQueryExecutionInfoVersion": 1,
@@ -21,7 +26,7 @@ class TestPipeline(unittest.TestCase):
                 "maxExclusive": "FF"
             }
         ]
-        pipeline = azure_cosmoscx.QueryEngine().create_pipeline(
+        pipeline = self.engine.create_pipeline(
             "SELECT * FROM c", plan, pkranges)
 
         self.assertEqual("SELECT * FROM c", pipeline.query())
@@ -42,7 +47,7 @@ class TestPipeline(unittest.TestCase):
                 "maxExclusive": "FF"
             }
         ]
-        pipeline = azure_cosmoscx.QueryEngine().create_pipeline(
+        pipeline = self.engine.create_pipeline(
             "SELECT * FROM c", plan, pkranges)
 
         self.assertEqual("WAS REWRITTEN", pipeline.query())
@@ -67,13 +72,14 @@ class TestPipeline(unittest.TestCase):
                 "maxExclusive": "FF"
             }
         ]
-        pipeline = azure_cosmoscx.QueryEngine().create_pipeline(
+        pipeline = self.engine.create_pipeline(
             "SELECT * FROM c", plan, pkranges)
 
         result = pipeline.next_batch()
         self.assertFalse(result.terminated)
 
         self.assertEqual(0, len(result.items))
+        self.assertEqual(len(result.items), result.item_count)
 
         requests = [(r.pkrange_id, r.continuation)
                     for r in result.requests]
@@ -102,7 +108,7 @@ class TestPipeline(unittest.TestCase):
                 "maxExclusive": "FF"
             }
         ]
-        pipeline = azure_cosmoscx.QueryEngine().create_pipeline(
+        pipeline = self.engine.create_pipeline(
             "SELECT * FROM c", plan, pkranges)
 
         pipeline.provide_data(
@@ -114,6 +120,7 @@ class TestPipeline(unittest.TestCase):
         self.assertFalse(result.terminated)
 
         self.assertEqual([1, 2], result.items)
+        self.assertEqual(len(result.items), result.item_count)
 
         requests = [(r.pkrange_id, r.continuation)
                     for r in result.requests]
@@ -130,6 +137,7 @@ class TestPipeline(unittest.TestCase):
         result = pipeline.next_batch()
         self.assertTrue(result.terminated)
         self.assertEqual([3, 4], result.items)
+        self.assertEqual(len(result.items), result.item_count)
         self.assertEqual([], result.requests)
 
     def test_pipeline_with_order_by(self):
@@ -153,7 +161,7 @@ class TestPipeline(unittest.TestCase):
                 "maxExclusive": "FF"
             }
         ]
-        pipeline = azure_cosmoscx.QueryEngine().create_pipeline(
+        pipeline = self.engine.create_pipeline(
             "SELECT * FROM c", plan, pkranges)
 
         pipeline.provide_data(
@@ -171,6 +179,7 @@ class TestPipeline(unittest.TestCase):
         self.assertFalse(result.terminated)
 
         self.assertEqual([3, 4], result.items)
+        self.assertEqual(len(result.items), result.item_count)
 
         requests = [(r.pkrange_id, r.continuation)
                     for r in result.requests]
@@ -186,6 +195,7 @@ class TestPipeline(unittest.TestCase):
         self.assertFalse(result.terminated)
 
         self.assertEqual([1, 2], result.items)
+        self.assertEqual(len(result.items), result.item_count)
         requests = [(r.pkrange_id, r.continuation)
                     for r in result.requests]
         self.assertEqual([("partition0", "p0c0")], requests)
@@ -196,4 +206,173 @@ class TestPipeline(unittest.TestCase):
         result = pipeline.next_batch()
         self.assertTrue(result.terminated)
         self.assertEqual([], result.items)
+        self.assertEqual(len(result.items), result.item_count)
         self.assertEqual([], result.requests)
+
+    def test_provide_data_batch(self):
+        plan = {
+            "partitionedQueryExecutionInfoVersion": 1,
+            "queryInfo": {
+                "distinctType": "None",
+                "orderBy": ["Ascending"],
+            },
+            "queryRanges": []
+        }
+        pkranges = [
+            {
+                "id": "partition0",
+                "minInclusive": "00",
+                "maxExclusive": "99"
+            },
+            {
+                "id": "partition1",
+                "minInclusive": "99",
+                "maxExclusive": "FF"
+            }
+        ]
+        pipeline = self.engine.create_pipeline(
+            "SELECT * FROM c", plan, pkranges)
+
+        pipeline.provide_data_batch([
+            ("partition0", 0, json.dumps({"Documents": [
+                {"orderByItems": [{"item": 2}], "payload": 2},
+                {"orderByItems": [{"item": 4}], "payload": 4},
+            ]}).encode(), None),
+            ("partition1", 0, json.dumps({"Documents": [
+                {"orderByItems": [{"item": 1}], "payload": 1},
+                {"orderByItems": [{"item": 3}], "payload": 3},
+            ]}).encode(), None),
+        ])
+
+        result = pipeline.next_batch()
+        self.assertTrue(result.terminated)
+        self.assertEqual([1, 2, 3, 4], [json.loads(i) for i in result.items])
+        self.assertEqual(len(result.items), result.item_count)
+        self.assertEqual([], result.requests)
+
+    def test_provide_data_batch_malformed_entry_applies_nothing(self):
+        plan = {
+            "partitionedQueryExecutionInfoVersion": 1,
+            "queryInfo": {
+                "distinctType": "None",
+                "orderBy": ["Ascending"],
+            },
+            "queryRanges": []
+        }
+        pkranges = [
+            {
+                "id": "partition0",
+                "minInclusive": "00",
+                "maxExclusive": "99"
+            },
+            {
+                "id": "partition1",
+                "minInclusive": "99",
+                "maxExclusive": "FF"
+            }
+        ]
+        pipeline = self.engine.create_pipeline(
+            "SELECT * FROM c", plan, pkranges)
+
+        # Any sequence is accepted, but every entry must be well-formed before any of them are applied.
+        with self.assertRaises(TypeError):
+            pipeline.provide_data_batch((
+                ("partition0", 0, b'{"Documents": []}', None),
+                ("partition1", 0, "not bytes", None),
+            ))
+
+        # The same holds for a string that can't be encoded as UTF-8, like a lone surrogate.
+        with self.assertRaises(UnicodeEncodeError):
+            pipeline.provide_data_batch([
+                ("partition0", 0, b'{"Documents": []}', None),
+                ("partition1", 0, b'{"Documents": []}', "\ud800"),
+            ])
+
+        result = pipeline.next_batch()
+        self.assertFalse(result.terminated)
+        self.assertEqual(0, len(result.items))
+        requests = [(r.pkrange_id, r.continuation)
+                    for r in result.requests]
+        self.assertEqual([
+            ("partition0", None),
+            ("partition1", None)
+        ], requests)
+
+    def test_run_to_completion(self):
+        plan = {
+            "partitionedQueryExecutionInfoVersion": 1,
+            "queryInfo": {
+                "distinctType": "None",
+            },
+            "queryRanges": []
+        }
+        pkranges = [
+            {
+                "id": "partition0",
+                "minInclusive": "00",
+                "maxExclusive": "99"
+            },
+            {
+                "id": "partition1",
+                "minInclusive": "99",
+                "maxExclusive": "FF"
+            }
+        ]
+        pipeline = self.engine.create_pipeline(
+            "SELECT * FROM c", plan, pkranges)
+
+        pages = {
+            ("partition0", None): ([1, 2], "p0c0"),
+            ("partition0", "p0c0"): ([3], None),
+            ("partition1", None): ([4], None),
+        }
+        calls = []
+
+        def provider(pkrange_id, continuation, query, include_parameters):
+            # The pipeline lock must not be held here, or this call would deadlock.
+            self.assertEqual("SELECT * FROM c", pipeline.query())
+            calls.append((pkrange_id, continuation, query))
+            items, next_continuation = pages[(pkrange_id, continuation)]
+            return json.dumps({"Documents": items}).encode(), next_continuation
+
+        items = pipeline.run_to_completion(provider)
+
+        self.assertEqual([1, 2, 3, 4], [json.loads(i) for i in items])
+        self.assertEqual([
+            ("partition0", None, None),
+            ("partition0", "p0c0", None),
+            ("partition1", None, None),
+        ], calls)
+
+        # Once terminated, the pipeline has no more requests, so the provider isn't called again.
+        self.assertEqual([], pipeline.run_to_completion(provider))
+        self.assertEqual(3, len(calls))
+
+    def test_run_to_completion_raises_when_pipeline_stalls(self):
+        # A hybrid search that needs global statistics, but has no partitions to query for them,
+        # never terminates and never issues a request.
+        plan = {
+            "partitionedQueryExecutionInfoVersion": 1,
+            "queryInfo": None,
+            "queryRanges": [],
+            "hybrid_search_query_info": {
+                "global_statistics_query": "SELECT COUNT(1) AS documentCount FROM c",
+                "component_query_infos": [
+                    {
+                        "distinctType": "None",
+                    },
+                ],
+                "component_weights": [],
+                "skip": None,
+                "take": 10,
+                "requires_global_statistics": True,
+            },
+        }
+        pipeline = self.engine.create_pipeline(
+            "SELECT * FROM c", plan, [])
+
+        def provider(pkrange_id, continuation, query, include_parameters):
+            self.fail("the provider should not be called by a stalled pipeline")
+
+        with self.assertRaisesRegex(RuntimeError, "pipeline stalled"):
+            pipeline.run_to_completion(provider)